@@ -3,12 +3,11 @@ DcmMeta header extension and NiftiWrapper for working with extended Niftis.
 """
 from __future__ import print_function
 
-import sys, re, json, warnings
+import json, warnings
 from copy import deepcopy
-try:
-    from collections import OrderedDict
-except ImportError:
-    from ordereddict import OrderedDict
+from itertools import chain
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 import nibabel as nb
@@ -17,8 +16,13 @@ from nibabel.spatialimages import HeaderDataError
 with warnings.catch_warnings():
     warnings.simplefilter('ignore')
     from nibabel.nicom.dicomwrappers import wrapper_from_data
+try:
+    import orjson
+    have_orjson = True
+except ImportError:
+    have_orjson = False
 
-from .utils import iteritems, unicode_str, PY2
+from .utils import iteritems, unicode_str, byte_str, OrderedDict
 
 dcm_meta_ecode = 0
 
@@ -42,6 +46,18 @@ _req_base_keys_map= {0.5 : set(('dcmmeta_affine',
                     }
 '''Minimum required keys in the base dictionaty to be considered valid'''
 
+def _as_numeric_array(sequence):
+    '''Return the sequence if it is already a non-empty, one dimensional,
+    numeric array, otherwise None.
+
+    Lists are not converted, as the Python loops that handle them exit on the
+    first mismatch and are faster than converting the whole list.'''
+    if (isinstance(sequence, np.ndarray) and sequence.ndim == 1 and
+        sequence.size != 0 and sequence.dtype.kind in 'biuf'
+       ):
+        return sequence
+    return None
+
 def is_constant(sequence, period=None):
     '''Returns true if all elements in (each period of) the sequence are equal.
 
@@ -54,6 +70,9 @@ def is_constant(sequence, period=None):
         If not None then each subsequence of that length is checked.
     '''
     if period is None:
+        arr = _as_numeric_array(sequence)
+        if arr is not None:
+            return bool((arr == arr[0]).all())
         return all(val == sequence[0] for val in sequence)
     else:
         if period <= 1:
@@ -62,6 +81,10 @@ def is_constant(sequence, period=None):
         if seq_len % period != 0:
             raise ValueError('The sequence length is not evenly divisible by '
                              'the period length.')
+        arr = _as_numeric_array(sequence)
+        if arr is not None:
+            arr = arr.reshape(seq_len // period, period)
+            return bool((arr == arr[:, :1]).all())
         for period_idx in range(seq_len // period):
             start_idx = period_idx * period
             end_idx = start_idx + period
@@ -91,14 +114,79 @@ def is_repeating(sequence, period):
         raise ValueError('The sequence length is not evenly divisible by the '
                          'period length.')
 
+    #Arrays are compared in bulk, after checking the second period so we can
+    #exit early as the Python comparison below does
+    arr = _as_numeric_array(sequence)
+    if arr is not None:
+        if not (arr[period:2 * period] == arr[:period]).all():
+            return False
+        tiles = arr.reshape(seq_len // period, period)
+        return bool((tiles[2:] == tiles[0]).all())
+
+    first = sequence[:period]
     for period_idx in range(1, seq_len // period):
         start_idx = period_idx * period
         end_idx = start_idx + period
-        if sequence[start_idx:end_idx] != sequence[:period]:
+        if sequence[start_idx:end_idx] != first:
             return False
 
     return True
 
+_immutable_types = (type(None), bool, int, float, unicode_str, byte_str)
+'''Types of meta data values that can be shared instead of copied'''
+
+def _fast_copy(value):
+    '''Return a deep copy of a meta data value. The JSON types (scalars, lists
+    and dicts) are handled directly, anything else is passed to `deepcopy`.
+    '''
+    val_type = type(value)
+    if val_type in _immutable_types:
+        return value
+    if val_type is list:
+        return [_fast_copy(elem) for elem in value]
+    if val_type is dict or val_type is OrderedDict:
+        return val_type((key, _fast_copy(elem))
+                        for key, elem in iteritems(value))
+    return deepcopy(value)
+
+def _interleave(first, second, first_len, second_len, n_chunks):
+    '''Interleave `n_chunks` consecutive chunks of `first_len` elements from
+    `first` with chunks of `second_len` elements from `second`.'''
+    chunk_len = first_len + second_len
+    if chunk_len < n_chunks:
+        #Many short chunks, fill each position within the chunks using an
+        #extended slice assignment
+        result = [None] * (chunk_len * n_chunks)
+        for offset in range(first_len):
+            result[offset::chunk_len] = first[offset::first_len]
+        for offset in range(second_len):
+            result[first_len + offset::chunk_len] = second[offset::second_len]
+    else:
+        result = []
+        extend = result.extend
+        for idx in range(n_chunks):
+            extend(first[idx * first_len:(idx + 1) * first_len])
+            extend(second[idx * second_len:(idx + 1) * second_len])
+    return result
+
+
+_thread_min_bytes = 2 ** 25
+'''Minimum total size of the data for threads to be used when joining'''
+
+_max_threads = 8
+'''Maximum number of threads used when joining data'''
+
+def _thread_map(func, args, n_threads):
+    '''Return the list of results from calling `func` on each of `args`,
+    using a pool of `n_threads` threads if that is more than one.'''
+    if n_threads <= 1:
+        return [func(arg) for arg in args]
+    pool = ThreadPool(n_threads)
+    try:
+        return pool.map(func, args)
+    finally:
+        pool.close()
+        pool.join()
 
 class InvalidExtensionError(Exception):
     def __init__(self, msg):
@@ -135,11 +223,23 @@ class DcmMetaExtension(Nifti1Extension):
         else:
             self._content['dcmmeta_reorient_transform'] = value.tolist()
 
+    _affine_src = None
+    '''The affine list from _content that the cached array was built from'''
+
+    _affine_cache = None
+
     @property
     def affine(self):
         '''The affine associated with the meta data. If this differs from the
-        image affine, the per-slice meta data will not be used. '''
-        return np.array(self._content['dcmmeta_affine'])
+        image affine, the per-slice meta data will not be used. The returned
+        array is read-only.'''
+        aff_list = self._content['dcmmeta_affine']
+        if aff_list is not self._affine_src:
+            affine = np.array(aff_list, dtype=np.float64)
+            affine.flags.writeable = False
+            self._affine_cache = affine
+            self._affine_src = aff_list
+        return self._affine_cache
 
     @affine.setter
     def affine(self, value):
@@ -209,6 +309,12 @@ class DcmMetaExtension(Nifti1Extension):
     '''The classifications used to separate meta data based on if and how the
     values repeat. Each class is a tuple with a base class and a sub class.'''
 
+    _mult_cache_key = None
+    '''The (shape, slice_dim) that the cached multiplicities were computed
+    for.'''
+
+    _mult_cache = None
+
     def get_valid_classes(self):
         '''Return the meta data classifications that are valid for this
         extension.
@@ -251,19 +357,29 @@ class DcmMetaExtension(Nifti1Extension):
         '''
         if not classification in self.get_valid_classes():
             raise ValueError("Invalid classification: %s" % classification)
+        shape = self.shape
+        slice_dim = self._content['dcmmeta_slice_dim']
+        cache_key = (shape, slice_dim)
+        if cache_key != self._mult_cache_key:
+            self._mult_cache_key = cache_key
+            self._mult_cache = {}
+        else:
+            n_vals = self._mult_cache.get(classification)
+            if n_vals is not None:
+                return n_vals
 
         base, sub = classification
-        shape = self.shape
         n_vals = 1
         if sub == 'slices':
-            n_vals = self.n_slices
-            if n_vals is None:
-                return 0
-            if base == 'vector':
-                n_vals *= shape[3]
-            elif base == 'global':
-                for dim_size in shape[3:]:
-                    n_vals *= dim_size
+            if slice_dim is None:
+                n_vals = 0
+            else:
+                n_vals = shape[slice_dim]
+                if base == 'vector':
+                    n_vals *= shape[3]
+                elif base == 'global':
+                    for dim_size in shape[3:]:
+                        n_vals *= dim_size
         elif sub == 'samples':
             if base == 'time':
                 n_vals = shape[3]
@@ -272,6 +388,7 @@ class DcmMetaExtension(Nifti1Extension):
             elif base == 'vector':
                 n_vals = shape[4]
 
+        self._mult_cache[classification] = n_vals
         return n_vals
 
     def check_valid(self):
@@ -285,17 +402,25 @@ class DcmMetaExtension(Nifti1Extension):
             classification.
         '''
         #Check for the required base keys in the json data
-        if not _req_base_keys_map[self.version] <= set(self._content):
-            raise InvalidExtensionError('Missing one or more required keys')
+        content = self._content
+        for req_key in _req_base_keys_map[self.version]:
+            if not req_key in content:
+                raise InvalidExtensionError('Missing required key: %s' %
+                                            req_key)
 
         #Check the orientation/shape/version
-        if self.affine.shape != (4, 4):
+        try:
+            affine = self.affine
+        except (ValueError, TypeError):
+            raise InvalidExtensionError('Affine has incorrect shape')
+        if affine.shape != (4, 4):
             raise InvalidExtensionError('Affine has incorrect shape')
         slice_dim = self.slice_dim
         if slice_dim is not None:
             if not (0 <= slice_dim < 3):
                 raise InvalidExtensionError('Slice dimension is not valid')
-        if not (3 <= len(self.shape) < 6):
+        shape = self.shape
+        if not (3 <= len(shape) < 6):
             raise InvalidExtensionError('Shape is not valid')
 
         #Check all required meta dictionaries, make sure values have correct
@@ -325,23 +450,20 @@ class DcmMetaExtension(Nifti1Extension):
                         raise InvalidExtensionError(msg)
 
         #Check that all keys are uniquely classified
+        seen = {}
         for classes in valid_classes:
-            for other_classes in valid_classes:
-                if classes == other_classes:
-                    continue
-                intersect = (set(self.get_class_dict(classes)) &
-                             set(self.get_class_dict(other_classes))
-                            )
-                if len(intersect) != 0:
-                    raise InvalidExtensionError("One or more keys have "
-                                                "multiple classifications")
+            for key in self.get_class_dict(classes):
+                if key in seen:
+                    raise InvalidExtensionError(('The key %s has multiple '
+                                                 'classifications: %s and %s') %
+                                                (key, seen[key], classes))
+                seen[key] = classes
 
     def get_keys(self):
         '''Get a list of all the meta data keys that are available.'''
-        keys = []
-        for base_class, sub_class in self.get_valid_classes():
-            keys += self._content[base_class][sub_class].keys()
-        return keys
+        return list(chain.from_iterable(self._content[base_class][sub_class]
+                                        for base_class, sub_class
+                                        in self.get_valid_classes()))
 
     def get_classification(self, key):
         '''Get the classification for the given `key`.
@@ -429,13 +551,12 @@ class DcmMetaExtension(Nifti1Extension):
 
         '''
         for classes in self.get_valid_classes():
-            filtered = []
             curr_dict = self.get_class_dict(classes)
-            for key, values in iteritems(curr_dict):
-                if filter_func(key, values):
-                    filtered.append(key)
-            for key in filtered:
-                del curr_dict[key]
+            kept = [(key, values) for key, values in iteritems(curr_dict)
+                    if not filter_func(key, values)]
+            if len(kept) != len(curr_dict):
+                curr_dict.clear()
+                curr_dict.update(kept)
 
     def clear_slice_meta(self):
         '''Clear all meta data that is per slice.'''
@@ -464,6 +585,7 @@ class DcmMetaExtension(Nifti1Extension):
             raise ValueError("The argument 'dim' must be in the range [0, 5).")
 
         shape = self.shape
+        slice_dim = self.slice_dim
         valid_classes = self.get_valid_classes()
 
         #Make an empty extension for the result
@@ -474,25 +596,21 @@ class DcmMetaExtension(Nifti1Extension):
         result = self.make_empty(result_shape,
                                  self.affine,
                                  self.reorient_transform,
-                                 self.slice_dim
+                                 slice_dim
                                 )
 
         for src_class in valid_classes:
-            #Constants remain constant
-            if src_class == ('global', 'const'):
-                for key, val in iteritems(self.get_class_dict(src_class)):
-                    result.get_class_dict(src_class)[key] = deepcopy(val)
-                continue
-
-            if dim == self.slice_dim:
-                if src_class[1] != 'slices':
-                    for key, vals in iteritems(self.get_class_dict(src_class)):
-                        result.get_class_dict(src_class)[key] = deepcopy(vals)
-                else:
-                    result._copy_slice(self, src_class, idx)
-            elif dim < 3:
-                for key, vals in iteritems(self.get_class_dict(src_class)):
-                    result.get_class_dict(src_class)[key] = deepcopy(vals)
+            #Constants remain constant, as does anything not varying along
+            #the dimension
+            if (src_class == ('global', 'const') or
+                dim < 3 and (dim != slice_dim or src_class[1] != 'slices')
+               ):
+                result.get_class_dict(src_class).update(
+                    (key, _fast_copy(vals))
+                    for key, vals in iteritems(self.get_class_dict(src_class))
+                )
+            elif dim == slice_dim:
+                result._copy_slice(self, src_class, idx)
             elif dim == 3:
                 result._copy_sample(self, src_class, 'time', idx)
             else:
@@ -636,7 +754,7 @@ class DcmMetaExtension(Nifti1Extension):
             if classes[1] == 'slices' and not use_slices:
                 continue
             result._content[classes[0]][classes[1]] = \
-                deepcopy(first_input.get_class_dict(classes))
+                _fast_copy(first_input.get_class_dict(classes))
 
         #Adjust the shape to what the extension actually contains
         shape = list(result.shape)
@@ -646,29 +764,30 @@ class DcmMetaExtension(Nifti1Extension):
         #Initialize reorient transform
         reorient_transform = first_input.reorient_transform
 
-        #Add the other extensions, updating the shape as we go
+        #Add the other extensions, updating the shape as we go. The shape was
+        #validated above so we update the stored list directly.
+        result_shape = result._content['dcmmeta_shape']
         for input_ext in seq[1:]:
             #If the affines or reorient_transforms don't match, we set the
             #reorient_transform to None as we can not reliably use it to update
             #directional meta data
+            input_reorient = input_ext.reorient_transform
             if ((reorient_transform is None or
-                 input_ext.reorient_transform is None) or
+                 input_reorient is None) or
                 not (np.allclose(input_ext.affine, affine) or
-                     np.allclose(input_ext.reorient_transform,
-                                 reorient_transform)
+                     np.allclose(input_reorient, reorient_transform)
                     )
                ):
                 reorient_transform = None
-            result._insert(dim, input_ext)
-            shape[dim] += 1
-            result.shape = shape
+            result._insert(dim, input_ext, result_slc_norm)
+            result_shape[dim] += 1
 
         #Set the reorient transform
         result.reorient_transform = reorient_transform
 
         #Try simplifying any keys in global slices
         for key in list(result.get_class_dict(('global', 'slices'))):
-            result._simplify(key)
+            result._simplify(key, ('global', 'slices'))
 
         return result
 
@@ -676,40 +795,47 @@ class DcmMetaExtension(Nifti1Extension):
         return self._mangle(self._content)
 
     def __eq__(self, other):
-        if not np.allclose(self.affine, other.affine):
-            return False
         if self.shape != other.shape:
             return False
         if self.slice_dim != other.slice_dim:
             return False
         if self.version != other.version:
             return False
+        self_aff = self.affine
+        other_aff = other.affine
+        if (not np.array_equal(self_aff, other_aff) and
+            not np.allclose(self_aff, other_aff)):
+            return False
         for classes in self.get_valid_classes():
-            if (dict(self.get_class_dict(classes)) !=
-               dict(other.get_class_dict(classes))):
+            #Use the dict comparison directly so the order of keys is ignored
+            #even for OrderedDict, without making copies
+            if not dict.__eq__(self.get_class_dict(classes),
+                               other.get_class_dict(classes)):
                 return False
 
         return True
 
     def _unmangle(self, value):
         '''Go from extension data to runtime representation.'''
+        if have_orjson:
+            try:
+                return orjson.loads(value)
+            except orjson.JSONDecodeError:
+                #Fall back to the standard library for anything orjson rejects
+                #(e.g. NaN values)
+                pass
         if not isinstance(value, unicode_str):
             value = value.decode('utf-8')
-        #Its not possible to preserve order while loading with python 2.6
-        kwargs = {}
-        if sys.version_info >= (2, 7):
-            kwargs['object_pairs_hook'] = OrderedDict
-        return json.loads(value, **kwargs)
+        #Plain dicts already preserve order, and the pairs hook is slower
+        if OrderedDict is dict:
+            return json.loads(value)
+        return json.loads(value, object_pairs_hook=OrderedDict)
 
     def _mangle(self, value):
         '''Go from runtime representation to extension data.'''
-        res = json.dumps(value, indent=4)
-        # Python 2 leaves some trailing white-space in the JSON output while
-        # python 3 does not. We strip it so output is binary identical across 
-        # versions
-        if PY2:
-            res = re.sub('[ \t]+$', '', res, 0, re.M)
-        return res.encode('utf-8')
+        #Always use the standard library here, orjson would write NaN/Inf as
+        #null and the output should not depend on the installed packages
+        return json.dumps(value, separators=(',', ':')).encode('utf-8')
 
     _const_tests = {('global', 'slices') : (('global', 'const'),
                                             ('vector', 'samples'),
@@ -734,7 +860,8 @@ class DcmMetaExtension(Nifti1Extension):
         if dest_cls == ('global', 'const'):
             return None
         elif src_cls == ('global', 'slices'):
-            return int(self.get_multiplicity(src_cls) // self.get_multiplicity(dest_cls))
+            return (self.get_multiplicity(src_cls) //
+                    self.get_multiplicity(dest_cls))
         elif src_cls == ('vector', 'slices'): #implies dest_cls == ('time', 'samples'):
             return  self.n_slices
         elif src_cls == ('time', 'samples'): #implies dest_cls == ('vector', 'samples')
@@ -749,15 +876,21 @@ class DcmMetaExtension(Nifti1Extension):
     '''Classification mapping showing possible reductions in multiplicity for
     values that are repeating with some period.'''
 
-    def _simplify(self, key):
+    def _simplify(self, key, curr_class=None):
         '''Try to simplify (reduce the multiplicity) of a single meta data
         element by changing its classification. Return True if the
         classification is changed, otherwise False.
 
         Looks for values that are constant or repeating with some pattern.
         Constant elements with a value of None will be deleted.
+
+        If the current classification of the key is already known it can be
+        passed as `curr_class` to avoid looking it up.
         '''
-        values, curr_class = self.get_values_and_class(key)
+        if curr_class is None:
+            values, curr_class = self.get_values_and_class(key)
+        else:
+            values = self.get_class_dict(curr_class)[key]
 
         #If the class is global const then just delete it if the value is None
         if curr_class == ('global', 'const'):
@@ -828,16 +961,27 @@ class DcmMetaExtension(Nifti1Extension):
     '''Classification mapping showing allowed changes when increasing the
     multiplicity.'''
 
+    _preserving_sets = dict((src_cls, frozenset(dest_classes))
+                            for src_cls, dest_classes
+                            in iteritems(_preserving_changes))
+    '''The same mapping as `_preserving_changes` with unordered sets of
+    destination classes, for fast membership tests.'''
+
     def _get_changed_class(self, key, new_class, slice_dim=None):
         '''Get an array of values corresponding to a single meta data
         element with its classification changed by increasing its
         multiplicity. This will preserve all the meta data and allow easier
         merging of values with different classifications.'''
         values, curr_class = self.get_values_and_class(key)
+        return self._changed_values(values, curr_class, new_class, slice_dim)
+
+    def _changed_values(self, values, curr_class, new_class, slice_dim=None):
+        '''Implementation of _get_changed_class operating on the already
+        looked up `values` and `curr_class` of a meta data element.'''
         if curr_class == new_class:
             return values
 
-        if not new_class in self._preserving_changes[curr_class]:
+        if not new_class in self._preserving_sets[curr_class]:
             raise ValueError("Classification change would lose data.")
 
         if curr_class is None:
@@ -853,7 +997,7 @@ class DcmMetaExtension(Nifti1Extension):
                 new_mult = self.shape[slice_dim]
         else:
             new_mult = 1
-        mult_fact = int(new_mult // curr_mult)
+        mult_fact = new_mult // curr_mult
         if curr_mult == 1:
             values = [values]
 
@@ -861,9 +1005,8 @@ class DcmMetaExtension(Nifti1Extension):
         if per_slice:
             result = values * mult_fact
         else:
-            result = []
-            for value in values:
-                result.extend([deepcopy(value)] * mult_fact)
+            result = list(chain.from_iterable([_fast_copy(value)] * mult_fact
+                                              for value in values))
 
         if new_class == ('global', 'const'):
             result = result[0]
@@ -878,34 +1021,47 @@ class DcmMetaExtension(Nifti1Extension):
         if curr_class == new_class:
             return
 
-        self.get_class_dict(new_class)[key] = self._get_changed_class(key,
-                                                                      new_class)
+        self.get_class_dict(new_class)[key] = \
+            self._changed_values(values, curr_class, new_class)
 
         if not curr_class is None:
             del self.get_class_dict(curr_class)[key]
 
+    _slice_subset_tests = {'global' : (('time', 'samples'),
+                                       ('vector', 'samples'),
+                                       ('global', 'const'),
+                                      ),
+                           'vector' : (('time', 'samples'),
+                                       ('global', 'const'),
+                                      ),
+                           'time' : (('global', 'const'),
+                                    ),
+                          }
+    '''Mapping from the base class of per-slice meta data to the candidate
+    classifications (in order of preference) for a single slice subset.'''
 
+    _slice_subset_dests = {}
+    '''Cache of the chosen classification for a single slice subset, keyed by
+    the source base class and the valid classes of the subset.'''
+
+    def _get_slice_subset_class(self, src_base):
+        '''Get the classification for a single slice subset of per-slice meta
+        data with the base class `src_base`.'''
+        valid_classes = self.get_valid_classes()
+        cache_key = (src_base, valid_classes)
+        dest_class = self._slice_subset_dests.get(cache_key)
+        if dest_class is None:
+            for dest_class in self._slice_subset_tests[src_base]:
+                if dest_class in valid_classes:
+                    break
+            self._slice_subset_dests[cache_key] = dest_class
+        return dest_class
 
     def _copy_slice(self, other, src_class, idx):
         '''Get a copy of the meta data from the 'other' instance with
         classification 'src_class', corresponding to the slice with index
         'idx'.'''
-        if src_class[0] == 'global':
-            for classes in (('time', 'samples'),
-                            ('vector', 'samples'),
-                            ('global', 'const')):
-                if classes in self.get_valid_classes():
-                    dest_class = classes
-                    break
-        elif src_class[0] == 'vector':
-            for classes in (('time', 'samples'),
-                            ('global', 'const')):
-                if classes in self.get_valid_classes():
-                    dest_class = classes
-                    break
-        else:
-            dest_class = ('global', 'const')
-
+        dest_class = self._get_slice_subset_class(src_class[0])
         src_dict = other.get_class_dict(src_class)
         dest_dict = self.get_class_dict(dest_class)
         dest_mult = self.get_multiplicity(dest_class)
@@ -913,15 +1069,13 @@ class DcmMetaExtension(Nifti1Extension):
         for key, vals in iteritems(src_dict):
             subset_vals = vals[idx::stride]
 
+            #The repeated elements are copied individually below
             if len(subset_vals) < dest_mult:
-                full_vals = []
-                for val_idx in range(dest_mult // len(subset_vals)):
-                    full_vals += deepcopy(subset_vals)
-                subset_vals = full_vals
+                subset_vals = subset_vals * (dest_mult // len(subset_vals))
             if len(subset_vals) == 1:
                 subset_vals = subset_vals[0]
-            dest_dict[key] = deepcopy(subset_vals)
-            self._simplify(key)
+            dest_dict[key] = _fast_copy(subset_vals)
+            self._simplify(key, dest_class)
 
     def _global_slice_subset(self, key, sample_base, idx):
         '''Get a subset of the meta data values with the classificaion
@@ -930,24 +1084,26 @@ class DcmMetaExtension(Nifti1Extension):
         '''
         n_slices = self.n_slices
         shape = self.shape
-        src_dict = self.get_class_dict(('global', 'slices'))
+        src_vals = self.get_class_dict(('global', 'slices'))[key]
         if sample_base == 'vector':
             slices_per_vec = n_slices * shape[3]
             start_idx = idx * slices_per_vec
             end_idx = start_idx + slices_per_vec
-            return src_dict[key][start_idx:end_idx]
+            return src_vals[start_idx:end_idx]
         else:
             if not ('vector', 'samples') in self.get_valid_classes():
                 start_idx = idx * n_slices
                 end_idx = start_idx + n_slices
-                return src_dict[key][start_idx:end_idx]
+                return src_vals[start_idx:end_idx]
             else:
-                result = []
+                n_vec = shape[4]
+                result = [None] * (n_vec * n_slices)
                 slices_per_vec = n_slices * shape[3]
-                for vec_idx in range(shape[4]):
+                for vec_idx in range(n_vec):
                     start_idx = (vec_idx * slices_per_vec) + (idx * n_slices)
-                    end_idx = start_idx + n_slices
-                    result.extend(src_dict[key][start_idx:end_idx])
+                    dest_idx = vec_idx * n_slices
+                    result[dest_idx:dest_idx + n_slices] = \
+                        src_vals[start_idx:start_idx + n_slices]
                 return result
 
     def _copy_sample(self, other, src_class, sample_base, idx):
@@ -962,74 +1118,81 @@ class DcmMetaExtension(Nifti1Extension):
             if src_class[0] == sample_base:
                 #Time samples may become vector samples, otherwise const
                 best_dest = None
+                valid_classes = self.get_valid_classes()
                 for dest_cls in (('vector', 'samples'),
                                  ('global', 'const')):
                     if (dest_cls != src_class and
-                        dest_cls in self.get_valid_classes()
+                        dest_cls in valid_classes
                        ):
                         best_dest = dest_cls
                         break
 
-                dest_mult = self.get_multiplicity(dest_cls)
+                dest_dict = self.get_class_dict(best_dest)
+                dest_mult = self.get_multiplicity(best_dest)
                 if dest_mult == 1:
                     for key, vals in iteritems(src_dict):
-                        self.get_class_dict(dest_cls)[key] = \
-                            deepcopy(vals[idx])
+                        dest_dict[key] = _fast_copy(vals[idx])
                 else: #We must be doing time samples -> vector samples
                     stride = other.shape[3]
                     for key, vals in iteritems(src_dict):
-                        self.get_class_dict(dest_cls)[key] = \
-                            deepcopy(vals[idx::stride])
+                        dest_dict[key] = _fast_copy(vals[idx::stride])
                     for key in src_dict.keys():
-                        self._simplify(key)
+                        self._simplify(key, best_dest)
 
             else: #Otherwise classification does not change
                 #The multiplicity will change for time samples if splitting
                 #vector dimension
+                dest_dict = self.get_class_dict(src_class)
                 if src_class == ('time', 'samples'):
                     dest_mult = self.get_multiplicity(src_class)
                     start_idx = idx * dest_mult
                     end_idx = start_idx + dest_mult
                     for key, vals in iteritems(src_dict):
-                        self.get_class_dict(src_class)[key] = \
-                            deepcopy(vals[start_idx:end_idx])
-                        self._simplify(key)
+                        dest_dict[key] = _fast_copy(vals[start_idx:end_idx])
+                        self._simplify(key, src_class)
                 else: #Otherwise multiplicity is unchanged
                     for key, vals in iteritems(src_dict):
-                        self.get_class_dict(src_class)[key] = deepcopy(vals)
+                        dest_dict[key] = _fast_copy(vals)
         else: #The src_class is per slice
             if src_class[0] == sample_base:
                 best_dest = None
+                valid_classes = self.get_valid_classes()
                 for dest_class in self._preserving_changes[src_class]:
-                    if dest_class in self.get_valid_classes():
+                    if dest_class in valid_classes:
                         best_dest = dest_class
                         break
+                dest_dict = self.get_class_dict(best_dest)
                 for key, vals in iteritems(src_dict):
-                    self.get_class_dict(best_dest)[key] = deepcopy(vals)
+                    dest_dict[key] = _fast_copy(vals)
             elif src_class[0] != 'global':
+                dest_dict = self.get_class_dict(src_class)
                 if sample_base == 'time':
                     #Take a subset of vector slices
                     n_slices = self.n_slices
                     start_idx = idx * n_slices
                     end_idx = start_idx + n_slices
                     for key, vals in iteritems(src_dict):
-                        self.get_class_dict(src_class)[key] = \
-                            deepcopy(vals[start_idx:end_idx])
-                        self._simplify(key)
+                        dest_dict[key] = _fast_copy(vals[start_idx:end_idx])
+                        self._simplify(key, src_class)
                 else:
                     #Time slices are unchanged
                     for key, vals in iteritems(src_dict):
-                        self.get_class_dict(src_class)[key] = deepcopy(vals)
+                        dest_dict[key] = _fast_copy(vals)
             else:
                 #Take a subset of global slices
-                for key, vals in iteritems(src_dict):
+                dest_dict = self.get_class_dict(src_class)
+                for key in src_dict:
                     subset_vals = \
                         other._global_slice_subset(key, sample_base, idx)
-                    self.get_class_dict(src_class)[key] = deepcopy(subset_vals)
-                    self._simplify(key)
-
-    def _insert(self, dim, other):
-        self_slc_norm = self.slice_normal
+                    dest_dict[key] = _fast_copy(subset_vals)
+                    self._simplify(key, src_class)
+
+    def _insert(self, dim, other, self_slc_norm=None):
+        '''Insert the meta data from `other` along the dimension `dim`. The
+        slice normal of this extension can be passed as `self_slc_norm` to
+        avoid recomputing it when inserting many extensions.'''
+        if self_slc_norm is None:
+            self_slc_norm = self.slice_normal
         other_slc_norm = other.slice_normal
 
         #If we are not using slice meta data, temporarily remove it from the
@@ -1043,44 +1206,61 @@ class DcmMetaExtension(Nifti1Extension):
                 if classes[1] == 'slices':
                     other_slc_meta[classes] = other.get_class_dict(classes)
                     other._content[classes[0]][classes[1]] = {}
-        missing_keys = list(set(self.get_keys()) - set(other.get_keys()))
+        missing_keys = list(frozenset(self.get_keys()) -
+                            frozenset(other.get_keys()))
+        slice_dim = self.slice_dim
+        preserving = self._preserving_changes
+        preserving_sets = self._preserving_sets
+        content = self._content
         for other_classes in other.get_valid_classes():
             other_keys = list(other.get_class_dict(other_classes).keys())
 
             #Treat missing keys as if they were in global const and have a value
             #of None
             if other_classes == ('global', 'const'):
-                other_keys += missing_keys
+                other_keys.extend(missing_keys)
 
             #When possible, reclassify our meta data so it matches the other
-            #classification
+            #classification. The best destination only depends on our
+            #classification, so find it once for each. Keep track of the
+            #resulting classification so it doesn't need to be looked up again
+            other_allow = preserving_sets[other_classes]
+            best_dests = {}
+            keys_and_classes = []
             for key in other_keys:
                 local_classes = self.get_classification(key)
                 if local_classes != other_classes:
-                    local_allow = self._preserving_changes[local_classes]
-                    other_allow = self._preserving_changes[other_classes]
-
-                    if other_classes in local_allow:
+                    if other_classes in preserving_sets[local_classes]:
                         self._change_class(key, other_classes)
+                        local_classes = other_classes
                     elif not local_classes in other_allow:
-                        best_dest = None
-                        for dest_class in local_allow:
-                            if (dest_class[0] in self._content and
-                               dest_class in other_allow):
-                                best_dest = dest_class
-                                break
+                        if local_classes in best_dests:
+                            best_dest = best_dests[local_classes]
+                        else:
+                            best_dest = None
+                            for dest_class in preserving[local_classes]:
+                                if (dest_class[0] in content and
+                                   dest_class in other_allow):
+                                    best_dest = dest_class
+                                    break
+                            best_dests[local_classes] = best_dest
                         self._change_class(key, best_dest)
+                        local_classes = best_dest
+                keys_and_classes.append((key, local_classes))
 
             #Insert new meta data and further reclassify as necessary
-            for key in other_keys:
-                if dim == self.slice_dim:
-                    self._insert_slice(key, other)
-                elif dim < 3:
-                    self._insert_non_slice(key, other)
-                elif dim == 3:
-                    self._insert_sample(key, other, 'time')
-                elif dim == 4:
-                    self._insert_sample(key, other, 'vector')
+            if dim == slice_dim:
+                for key, local_classes in keys_and_classes:
+                    self._insert_slice(key, other, local_classes)
+            elif dim < 3:
+                for key, local_classes in keys_and_classes:
+                    self._insert_non_slice(key, other, local_classes)
+            elif dim == 3:
+                for key, local_classes in keys_and_classes:
+                    self._insert_sample(key, other, 'time', local_classes)
+            elif dim == 4:
+                for key, local_classes in keys_and_classes:
+                    self._insert_sample(key, other, 'vector', local_classes)
 
         #Restore per slice meta if needed
         if not use_slices:
@@ -1089,9 +1269,14 @@ class DcmMetaExtension(Nifti1Extension):
                     other._content[classes[0]][classes[1]] = \
                         other_slc_meta[classes]
 
-    def _insert_slice(self, key, other):
-        local_vals, classes = self.get_values_and_class(key)
-        other_vals = other._get_changed_class(key, classes, self.slice_dim)
+    def _insert_slice(self, key, other, curr_class=None):
+        if curr_class is None:
+            local_vals, classes = self.get_values_and_class(key)
+        else:
+            local_vals = self.get_class_dict(curr_class)[key]
+            classes = curr_class
+        slice_dim = self.slice_dim
+        other_vals = other._get_changed_class(key, classes, slice_dim)
 
 
         #Handle some common / simple insertions with special cases
@@ -1103,7 +1288,7 @@ class DcmMetaExtension(Nifti1Extension):
                         other_vals = other._get_changed_class(key,
                                                               (dest_base,
                                                                'slices'),
-                                                               self.slice_dim
+                                                               slice_dim
                                                              )
                         self.get_values(key).extend(other_vals)
                         break
@@ -1116,37 +1301,39 @@ class DcmMetaExtension(Nifti1Extension):
                 local_vals = self.get_class_dict(('global', 'slices'))[key]
                 other_vals = other._get_changed_class(key,
                                                       ('global', 'slices'),
-                                                      self.slice_dim)
+                                                      slice_dim)
 
             #Need to interleave slices from different volumes
             n_slices = self.n_slices
             other_n_slices = other.n_slices
-            shape = self.shape
             n_vols = 1
-            for dim_size in shape[3:]:
+            for dim_size in self.shape[3:]:
                 n_vols *= dim_size
 
-            intlv = []
-            loc_start = 0
-            oth_start = 0
-            for vol_idx in range(n_vols):
-                intlv += local_vals[loc_start:loc_start + n_slices]
-                intlv += other_vals[oth_start:oth_start + other_n_slices]
-                loc_start += n_slices
-                oth_start += other_n_slices
+            self.get_class_dict(('global', 'slices'))[key] = \
+                _interleave(local_vals, other_vals, n_slices, other_n_slices,
+                            n_vols)
 
-            self.get_class_dict(('global', 'slices'))[key] = intlv
-
-    def _insert_non_slice(self, key, other):
-        local_vals, classes = self.get_values_and_class(key)
+    def _insert_non_slice(self, key, other, curr_class=None):
+        if curr_class is None:
+            local_vals, classes = self.get_values_and_class(key)
+        else:
+            local_vals = self.get_class_dict(curr_class)[key]
+            classes = curr_class
         other_vals = other._get_changed_class(key, classes, self.slice_dim)
 
         if local_vals != other_vals:
             del self.get_class_dict(classes)[key]
 
-    def _insert_sample(self, key, other, sample_base):
-        local_vals, classes = self.get_values_and_class(key)
-        other_vals = other._get_changed_class(key, classes, self.slice_dim)
+    def _insert_sample(self, key, other, sample_base,
+                       curr_class=None):
+        if curr_class is None:
+            local_vals, classes = self.get_values_and_class(key)
+        else:
+            local_vals = self.get_class_dict(curr_class)[key]
+            classes = curr_class
+        slice_dim = self.slice_dim
+        other_vals = other._get_changed_class(key, classes, slice_dim)
 
         if classes == ('global', 'const'):
             if local_vals != other_vals:
@@ -1154,7 +1341,7 @@ class DcmMetaExtension(Nifti1Extension):
                 local_vals = self.get_values(key)
                 other_vals = other._get_changed_class(key,
                                                       (sample_base, 'samples'),
-                                                      self.slice_dim
+                                                      slice_dim
                                                      )
                 local_vals.extend(other_vals)
         elif classes == (sample_base, 'samples'):
@@ -1165,7 +1352,7 @@ class DcmMetaExtension(Nifti1Extension):
                 local_vals = self.get_values(key)
                 other_vals = other._get_changed_class(key,
                                                       ('global', 'slices'),
-                                                      self.slice_dim)
+                                                      slice_dim)
 
             shape = self.shape
             n_dims = len(shape)
@@ -1176,16 +1363,9 @@ class DcmMetaExtension(Nifti1Extension):
                 slices_per_vec = n_slices * shape[3]
                 oth_slc_per_vec = n_slices * other.shape[3]
 
-                intlv = []
-                loc_start = 0
-                oth_start = 0
-                for vec_idx in range(shape[4]):
-                    intlv += local_vals[loc_start:loc_start+slices_per_vec]
-                    intlv += other_vals[oth_start:oth_start+oth_slc_per_vec]
-                    loc_start += slices_per_vec
-                    oth_start += oth_slc_per_vec
-
-                self.get_class_dict(('global', 'slices'))[key] = intlv
+                self.get_class_dict(('global', 'slices'))[key] = \
+                    _interleave(local_vals, other_vals, slices_per_vec,
+                                oth_slc_per_vec, shape[4])
             else:
                 local_vals.extend(other_vals)
 
@@ -1201,33 +1381,41 @@ class MissingExtensionError(Exception):
     def __str__(self):
         return 'No dcmmeta extension found.'
 
+_ds_is_conversions = {'DS' : ('FD', float),
+                      'IS' : ('SL', int),
+                     }
+'''Mapping from the 'DS' and 'IS' VRs to the replacement VR and the function
+used to convert the values'''
+
 def patch_dcm_ds_is(dcm):
     '''Convert all elements in `dcm` with VR of 'DS' or 'IS' to floats and ints.
     This is a hackish work around for the backwards incompatibility of pydicom
     0.9.7 and should not be needed once nibabel is updated.
     '''
     for elem in dcm:
+        conversion = _ds_is_conversions.get(elem.VR)
+        if conversion is None or elem.value == '':
+            continue
+        new_vr, conv_func = conversion
+        values = elem.value
+        elem.VR = new_vr
         if elem.VM == 1:
-            if elem.VR in ('DS', 'IS'):
-                if elem.value == '':
-                    continue
-                if elem.VR == 'DS':
-                    elem.VR = 'FD'
-                    elem.value = float(elem.value)
-                else:
-                    elem.VR = 'SL'
-                    elem.value = int(elem.value)
+            elem.value = conv_func(values)
         else:
-            if elem.VR in ('DS', 'IS'):
-                if elem.value == '':
-                    continue
-                if elem.VR == 'DS':
-                    elem.VR = 'FD'
-                    elem.value = [float(val) for val in elem.value]
-                else:
-                    elem.VR = 'SL'
-                    elem.value = [int(val) for val in elem.value]
+            elem.value = [conv_func(val) for val in values]
+
 
+def _remove_extension(hdr, extension):
+    '''Remove the `extension` object (compared by identity) from the Nifti
+    header `hdr`. Raises an IndexError if it is not found.'''
+    for idx, ext in enumerate(hdr.extensions):
+        if ext is extension:
+            del hdr.extensions[idx]
+            break
+    else:
+        raise IndexError('Extension not found in header')
+    # Nifti1Image.update_header will increase this if necessary
+    hdr['vox_offset'] = 0
 
 class NiftiWrapper(object):
     '''Wraps a Nifti1Image object containing a DcmMeta header extension.
@@ -1251,6 +1439,8 @@ class NiftiWrapper(object):
         More than one valid DcmMetaExtension was found.
     '''
 
+    __slots__ = ('nii_img', 'meta_ext')
+
     def __init__(self, nii_img, make_empty=False):
         self.nii_img = nii_img
         hdr = nii_img.header
@@ -1277,7 +1467,6 @@ class NiftiWrapper(object):
                 hdr.extensions.append(self.meta_ext)
             else:
                 raise MissingExtensionError
-        self.meta_ext.check_valid()
 
     def __getitem__(self, key):
         '''Get the value for the given meta data key. Only considers meta data
@@ -1292,22 +1481,26 @@ class NiftiWrapper(object):
         if classification == ('global', 'const'):
             return True
 
-        img_shape = self.nii_img.shape
-        meta_shape = self.meta_ext.shape
+        nii_img = self.nii_img
+        meta_ext = self.meta_ext
+        img_shape = nii_img.shape
+        meta_shape = meta_ext.shape
         if classification == ('vector', 'samples'):
             return meta_shape[4:] == img_shape[4:]
         if classification == ('time', 'samples'):
             return meta_shape[3:] == img_shape[3:]
 
-        hdr = self.nii_img.header
-        if self.meta_ext.n_slices != hdr.get_n_slices():
+        hdr = nii_img.header
+        if meta_ext.n_slices != hdr.get_n_slices():
             return False
 
+        #Same test as np.allclose(slice_dir, slice_norm, atol=1e-6) without
+        #its overhead for small arrays
         slice_dim = hdr.get_dim_info()[2]
-        slice_dir = self.nii_img.affine[slice_dim, :3]
-        slices_aligned = np.allclose(slice_dir,
-                                     self.meta_ext.slice_normal,
-                                     atol=1e-6)
+        slice_dir = nii_img.affine[slice_dim, :3]
+        slice_norm = meta_ext.slice_normal
+        slices_aligned = bool((np.abs(slice_dir - slice_norm) <=
+                               1e-6 + 1e-5 * np.abs(slice_norm)).all())
 
         if classification == ('time', 'slices'):
             return slices_aligned
@@ -1338,8 +1531,8 @@ class NiftiWrapper(object):
         Notes
         -----
         The per-sample and per-slice meta data will only be considered if the
-        `samples_valid` and `slices_valid` methods return True (respectively),
-        and an `index` is specified.
+        `meta_valid` method returns True for their classification, and an
+        `index` is specified.
         '''
         #Get the value(s) and classification for the key
         values, classes = self.meta_ext.get_values_and_class(key)
@@ -1357,7 +1550,8 @@ class NiftiWrapper(object):
         #If an index is provided check the varying values
         if not index is None:
             #Test if the index is valid
-            shape = self.nii_img.shape
+            nii_img = self.nii_img
+            shape = nii_img.shape
             if len(index) != len(shape):
                 raise IndexError('Incorrect number of indices.')
             for dim, ind_val in enumerate(index):
@@ -1371,13 +1565,13 @@ class NiftiWrapper(object):
                 return values[index[4]]
 
             #Finally, if aligned, try per-slice values
-            slice_dim = self.nii_img.header.get_dim_info()[2]
+            slice_dim = nii_img.header.get_dim_info()[2]
             n_slices = shape[slice_dim]
             if classes == ('global', 'slices'):
                 val_idx = index[slice_dim]
-                for count, idx_val in enumerate(index[3:]):
+                for idx_val, dim_size in zip(index[3:], shape[3:]):
                     val_idx += idx_val * n_slices
-                    n_slices *= shape[count+3]
+                    n_slices *= dim_size
                 return values[val_idx]
             elif classes == ('time', 'slices'):
                 val_idx = index[slice_dim]
@@ -1389,20 +1583,90 @@ class NiftiWrapper(object):
 
         return default
 
+    def get_meta_array(self, key, default=None):
+        '''Return the meta data values for the provided `key` as an array
+        with the same shape as the wrapped image. This is the preferred way to
+        look up varying meta data for many voxels, rather than calling
+        `get_meta` for each index.
+
+        Parameters
+        ----------
+        key : str
+            The meta data key.
+
+        default
+            This will be returned if the meta data for `key` is not found, or
+            its classification is not valid for the wrapped image.
+
+        Returns
+        -------
+        values : array
+            A read-only array with the meta data value for each voxel. Numeric
+            values give a numeric array, anything else gives an array with
+            object dtype.
+
+        Notes
+        -----
+        The result is a broadcast view of an array with one element per
+        distinct value, so no memory is allocated per voxel.
+        '''
+        values, classes = self.meta_ext.get_values_and_class(key)
+        if classes is None or not self.meta_valid(classes):
+            return default
+
+        #Get a one dimensional array with an element per meta data value
+        if classes == ('global', 'const'):
+            values = [values]
+        val_arr = None
+        #Only convert values of a single type, so ints aren't promoted
+        if len(set(map(type, values))) == 1:
+            try:
+                val_arr = np.asarray(values)
+            except ValueError:
+                pass
+            else:
+                if val_arr.ndim != 1 or val_arr.dtype.kind not in 'biuf':
+                    val_arr = None
+        if val_arr is None:
+            val_arr = np.empty(len(values), dtype=object)
+            for idx, val in enumerate(values):
+                val_arr[idx] = val
+
+        #Find the stride through the values for each voxel dimension
+        nii_img = self.nii_img
+        shape = nii_img.shape
+        n_dims = len(shape)
+        strides = {}
+        if classes[1] == 'samples':
+            if classes[0] == 'time':
+                strides[3] = 1
+                if n_dims > 4:
+                    strides[4] = shape[3]
+            else:
+                strides[4] = 1
+        elif classes[1] == 'slices':
+            slice_dim = nii_img.header.get_dim_info()[2]
+            n_slices = shape[slice_dim]
+            strides[slice_dim] = 1
+            if classes[0] != 'time' and n_dims > 3:
+                strides[3] = n_slices
+                if classes[0] == 'global' and n_dims > 4:
+                    strides[4] = n_slices * shape[3]
+
+        #Build up the index array, only expanding the dimensions that vary
+        val_idx = np.zeros((1,) * n_dims, dtype=np.intp)
+        for dim, stride in iteritems(strides):
+            dim_shape = [1] * n_dims
+            dim_shape[dim] = shape[dim]
+            val_idx = val_idx + \
+                (np.arange(shape[dim]) * stride).reshape(dim_shape)
+
+        return np.broadcast_to(val_arr[val_idx], shape)
+
     def remove_extension(self):
         '''Remove the DcmMetaExtension from the header of nii_img. The
         attribute `meta_ext` will still point to the extension.'''
-        hdr = self.nii_img.header
-        target_idx = None
-        for idx, ext in enumerate(hdr.extensions):
-            if id(ext) == id(self.meta_ext):
-                target_idx = idx
-                break
-        else:
-            raise IndexError('Extension not found in header')
-        del hdr.extensions[target_idx]
-        # Nifti1Image.update_header will increase this if necessary
-        hdr['vox_offset'] = 0
+        _remove_extension(self.nii_img.header, self.meta_ext)
 
     def replace_extension(self, dcmmeta_ext):
         '''Replace the DcmMetaExtension.
@@ -1453,16 +1717,27 @@ class NiftiWrapper(object):
         if dim < 3:
             trans_update = header.get_best_affine()[:3, dim]
 
+        #Remove our extension from the split header, so we don't need to
+        #validate it for each split before replacing it with the subset
         split_hdr = header.copy()
+        _remove_extension(split_hdr, self.meta_ext)
         slices = [slice(None)] * len(shape)
+        #Get rid of trailing singular dimensions in the split data
+        drop_dim = dim >= 3 and dim == len(shape) - 1
+        meta_dim = dim
+        if dim == slice_dim:
+            meta_dim = self.meta_ext.slice_dim
         for idx in range(shape[dim]):
-            #Grab the split data, get rid of trailing singular dimensions
-            if dim >= 3 and dim == len(shape) - 1:
+            #Grab the split data
+            if drop_dim:
                 slices[dim] = idx
             else:
                 slices[dim] = slice(idx, idx+1)
 
-            split_data = data[slices].copy()
+            #Copy so the result doesn't share memory with this image, but
+            #keep the memory layout (usually Fortran order) to avoid a slow
+            #transposing copy
+            split_data = data[tuple(slices)].copy(order='K')
 
             #Update the translation in any affines if needed
             if not trans_update is None and idx != 0:
@@ -1480,13 +1755,10 @@ class NiftiWrapper(object):
                                        split_hdr.get_best_affine(),
                                        header=split_hdr)
 
-            #Replace the meta data with the appropriate subset
-            meta_dim = dim
-            if dim == slice_dim:
-                meta_dim = self.meta_ext.slice_dim
+            #Add the appropriate subset of the meta data
             split_meta = self.meta_ext.get_subset(meta_dim, idx)
+            split_nii.header.extensions.append(split_meta)
             result = NiftiWrapper(split_nii)
-            result.replace_extension(split_meta)
 
             yield result
 
@@ -1647,8 +1919,20 @@ class NiftiWrapper(object):
             result_shape.append(1)
         result_shape[dim] = n_inputs
 
-        result_dtype = max(input_wrp.nii_img.get_data().dtype
-                           for input_wrp in seq)
+        #Reading, decompressing and copying the data all release the GIL, so
+        #use multiple threads when there is enough data
+        n_bytes = sum(int(np.prod(input_wrp.nii_img.shape)) *
+                      input_wrp.nii_img.get_data_dtype().itemsize
+                      for input_wrp in seq)
+        if n_bytes >= _thread_min_bytes:
+            n_threads = min(n_inputs, cpu_count(), _max_threads)
+        else:
+            n_threads = 1
+        seq_data = _thread_map(lambda input_wrp: input_wrp.nii_img.get_data(),
+                               seq,
+                               n_threads)
+        result_dtype = np.result_type(*[input_data.dtype
+                                        for input_data in seq_data])
         result_data = np.empty(result_shape, dtype=result_dtype)
 
         #Start with the header info from the first input
@@ -1673,11 +1957,7 @@ class NiftiWrapper(object):
         except HeaderDataError:
             hdr_info['slice_times'] = None
 
-        #Fill the data array, check header consistency
-        data_slices = [slice(None)] * len(result_shape)
-        for dim_idx, dim_size in enumerate(result_shape):
-            if dim_size == 1:
-                data_slices[dim_idx] = 0
+        #Check header consistency
         last_trans = None #Keep track of the translation from last input
         for input_idx in range(n_inputs):
 
@@ -1719,10 +1999,6 @@ class NiftiWrapper(object):
                     raise ValueError("Cannot join images with different "
                                      "orientations.")
 
-
-            data_slices[dim] = input_idx
-            result_data[data_slices] = input_nii.get_data().squeeze()
-
             if input_idx != 0:
                 if (hdr_info['qform'] is None or
                     input_hdr.get_qform() is None or
@@ -1765,6 +2041,19 @@ class NiftiWrapper(object):
                 except HeaderDataError:
                     hdr_info['slice_times'] = None
 
+        #Fill the data array
+        data_slices = [slice(None)] * len(result_shape)
+        for dim_idx, dim_size in enumerate(result_shape):
+            if dim_size == 1:
+                data_slices[dim_idx] = 0
+
+        def copy_input(input_idx):
+            input_slices = list(data_slices)
+            input_slices[dim] = input_idx
+            result_data[tuple(input_slices)] = seq_data[input_idx].squeeze()
+
+        _thread_map(copy_input, range(n_inputs), n_threads)
+
         #If we joined along a spatial dim, rescale the appropriate axis
         scaled_dim_dir = None
         if dim < 3:
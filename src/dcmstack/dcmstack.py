@@ -4,11 +4,7 @@ into the package namespace.
 """
 import warnings, re
 from copy import deepcopy
-
-try:
-    from collections import OrderedDict
-except ImportError:
-    from ordereddict import OrderedDict
+from collections import OrderedDict
 
 import numpy as np
 try:
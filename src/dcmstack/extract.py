@@ -3,13 +3,8 @@ Extract meta data from a DICOM data set.
 """
 import struct
 import warnings
-from collections import namedtuple, defaultdict
+from collections import namedtuple, defaultdict, OrderedDict
 
-try:
-    from collections import OrderedDict
-except ImportError:
-    from ordereddict import OrderedDict
-    
 try:
     import pydicom
     from pydicom.datadict import keyword_for_tag
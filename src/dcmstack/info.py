@@ -26,11 +26,8 @@ description = 'Stack DICOM images into volumes and convert to Nifti'
 install_requires = ['pydicom >= 0.9.7',
                     'nibabel >= 2.1.0',
                    ]
-# Add version specific dependencies
-if sys.version_info < (2, 6):
-    raise Exception("must use python 2.6 or greater")
-elif sys.version_info < (2, 7):
-    install_requires.append('ordereddict')
+if sys.version_info < (2, 7):
+    raise Exception("must use python 2.7 or greater")
 
 # Extra requirements for building documentation and testing
 extras_requires = {'doc':  ["sphinx", "numpydoc"],
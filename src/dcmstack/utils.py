@@ -13,3 +13,9 @@ byte_str = str if PY2 else bytes
 str_types = (unicode_str, byte_str)
 iteritems = (lambda d: d.iteritems()) if PY2 else lambda d: d.items()
 ascii_letters = string.letters if PY2 else string.ascii_letters
+
+# Builtin dicts preserve insertion order as of Python 3.7 and are faster
+if sys.version_info >= (3, 7):
+    OrderedDict = dict
+else:
+    from collections import OrderedDict
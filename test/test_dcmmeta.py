@@ -29,6 +29,14 @@ def test_is_constant():
     assert_raises(ValueError, dcmmeta.is_constant, [0, 0, 0], 2)
     assert_raises(ValueError, dcmmeta.is_constant, [0, 0, 0], 4)
 
+def test_is_constant_mixed():
+    ok_(dcmmeta.is_constant([0.5, 0.5, 0.5]))
+    ok_(dcmmeta.is_constant(['a', 'a', 'b', 'b'], period=2))
+    ok_(dcmmeta.is_constant([[0, 1], [0, 1]]))
+    eq_(dcmmeta.is_constant([[0, 1], [1, 0]]), False)
+    eq_(dcmmeta.is_constant([0, '0']), False)
+    eq_(dcmmeta.is_constant([None, 0, 0, 0], period=2), False)
+
 def test_is_repeating():
     ok_(dcmmeta.is_repeating([0, 1, 0, 1], 2))
     ok_(dcmmeta.is_repeating([0, 1, 0, 1, 0, 1], 2))
@@ -39,6 +47,81 @@ def test_is_repeating():
     assert_raises(ValueError, dcmmeta.is_repeating, [0, 1, 0, 1], 4)
     assert_raises(ValueError, dcmmeta.is_repeating, [0, 1, 0, 1], 5)
 
+def test_is_repeating_mixed():
+    ok_(dcmmeta.is_repeating([0.5, 1.5, 0.5, 1.5], 2))
+    ok_(dcmmeta.is_repeating(['a', 'b', 'a', 'b'], 2))
+    eq_(dcmmeta.is_repeating([0, '1', 0, 1], 2), False)
+    eq_(dcmmeta.is_repeating([[0], [1], [0], [2]], 2), False)
+
+def test_large_numeric():
+    vals = list(range(10)) * 30
+    ok_(dcmmeta.is_repeating(vals, 10))
+    eq_(dcmmeta.is_repeating(vals[:-1] + [0], 10), False)
+    vals = [float(val) for val in sorted(vals)]
+    ok_(dcmmeta.is_constant(vals, 30))
+    eq_(dcmmeta.is_constant(vals[:-1] + [0.0], 30), False)
+    ok_(dcmmeta.is_constant([0.5] * 300))
+    eq_(dcmmeta.is_constant([0.5] * 299 + [1]), False)
+
+def test_numeric_array():
+    vals = np.repeat(np.arange(10.0), 30)
+    ok_(dcmmeta.is_constant(vals, 30))
+    eq_(dcmmeta.is_constant(vals, 60), False)
+    ok_(dcmmeta.is_constant(np.zeros(300)))
+    eq_(dcmmeta.is_constant(np.arange(300)), False)
+    vals = np.tile(np.arange(10), 30)
+    ok_(dcmmeta.is_repeating(vals, 10))
+    ok_(dcmmeta.is_repeating(vals, 20))
+    vals[-1] = 0
+    eq_(dcmmeta.is_repeating(vals, 10), False)
+    vals[-1] = 9
+    vals[15] = 0
+    eq_(dcmmeta.is_repeating(vals, 10), False)
+
+def test_mixed_int_float():
+    #Large ints must not be compared after promotion to float
+    big_int = 2**53 + 1
+    eq_(dcmmeta.is_constant([big_int, float(2**53)]), False)
+    eq_(dcmmeta.is_constant([big_int, float(2**53)], 2), False)
+    eq_(dcmmeta.is_repeating([big_int, 0, float(2**53), 0], 2), False)
+    ok_(dcmmeta.is_constant([1, 1.0]))
+    ok_(dcmmeta.is_repeating([1, 2.0, 1.0, 2], 2))
+
+def test_fast_copy():
+    src = {'a': [1, [2.0, 'b']], 'c': None, 'd': {'e': [True]}}
+    cpy = dcmmeta._fast_copy(src)
+    eq_(cpy, src)
+    ok_(not cpy['a'] is src['a'])
+    ok_(not cpy['a'][1] is src['a'][1])
+    ok_(not cpy['d']['e'] is src['d']['e'])
+    arr = np.arange(3)
+    arr_cpy = dcmmeta._fast_copy(arr)
+    ok_(np.all(arr_cpy == arr))
+    ok_(not arr_cpy is arr)
+
+def test_interleave():
+    eq_(dcmmeta._interleave([0, 1, 2, 3], ['a', 'b'], 2, 1, 2),
+        [0, 1, 'a', 2, 3, 'b'])
+    for first, second in ((list(range(200)), list(range(200, 300))),
+                          ([0.5] * 200, ['a'] * 100),
+                         ):
+        for first_len, second_len, n_chunks in ((20, 10, 10), (2, 1, 100)):
+            result = dcmmeta._interleave(first, second, first_len,
+                                         second_len, n_chunks)
+            expected = []
+            for idx in range(n_chunks):
+                expected += first[idx * first_len:(idx + 1) * first_len]
+                expected += second[idx * second_len:(idx + 1) * second_len]
+            eq_(result, expected)
+
+def test_mangle_non_finite():
+    ext = dcmmeta.DcmMetaExtension.make_empty((2, 2, 2), np.eye(4))
+    data = {'nan' : float('nan'), 'inf' : float('inf'), 'ninf' : -np.inf}
+    result = ext._unmangle(ext._mangle(data))
+    ok_(np.isnan(result['nan']))
+    eq_(result['inf'], float('inf'))
+    eq_(result['ninf'], -float('inf'))
+
 def test_get_valid_classes():
     ext = dcmmeta.DcmMetaExtension.make_empty((2, 2, 2), np.eye(4))
     eq_(ext.get_valid_classes(), (('global', 'const'), ('global', 'slices')))
@@ -105,6 +188,17 @@ def test_get_mulitplicity_5d():
     eq_(ext.get_multiplicity(('vector', 'samples')), 13)
     eq_(ext.get_multiplicity(('vector', 'slices')), 7 * 11)
 
+def test_get_multiplicity_after_update():
+    ext = dcmmeta.DcmMetaExtension.make_empty((64, 64, 7, 11),
+                                              np.eye(4),
+                                              np.eye(4),
+                                              2)
+    eq_(ext.get_multiplicity(('global', 'slices')), 7 * 11)
+    ext.shape = (64, 64, 5, 11)
+    eq_(ext.get_multiplicity(('global', 'slices')), 5 * 11)
+    ext.slice_dim = None
+    eq_(ext.get_multiplicity(('global', 'slices')), 0)
+
 class TestCheckValid(object):
     def setUp(self):
         self.ext = dcmmeta.DcmMetaExtension.make_empty((64, 64, 2, 3, 4),
@@ -171,6 +265,10 @@ class TestCheckValid(object):
     def test_invalid_affine(self):
         self.ext._content['dcmmeta_affine'] = np.eye(3).tolist()
         assert_raises(dcmmeta.InvalidExtensionError, self.ext.check_valid)
+        self.ext._content['dcmmeta_affine'] = 'bad'
+        assert_raises(dcmmeta.InvalidExtensionError, self.ext.check_valid)
+        self.ext._content['dcmmeta_affine'] = [[1, 0], [0, 1, 0]]
+        assert_raises(dcmmeta.InvalidExtensionError, self.ext.check_valid)
 
     def test_invalid_slice_dim(self):
         self.ext._content['dcmmeta_slice_dim'] = 3
@@ -188,6 +286,8 @@ class TestCheckValid(object):
         self.ext.get_class_dict(('global', 'const'))['Test'] = 0
         self.ext.get_class_dict(('time', 'samples'))['Test'] = [0] * 3
         assert_raises(dcmmeta.InvalidExtensionError, self.ext.check_valid)
+        self.ext.get_class_dict(('time', 'samples'))['Test'] = [0] * 12
+        assert_raises(dcmmeta.InvalidExtensionError, self.ext.check_valid)
 
 def test_dcmmeta_affine():
     ext = dcmmeta.DcmMetaExtension.make_empty((64, 64, 2),
@@ -204,6 +304,10 @@ def test_dcmmeta_affine():
                  )
     ext.affine = np.eye(4)
     ok_(np.allclose(ext.affine, np.eye(4)))
+    ok_(ext.affine is ext.affine)
+    eq_(ext.affine.flags.writeable, False)
+    ext._content['dcmmeta_affine'] = np.diag([2, 2, 2, 1]).tolist()
+    ok_(np.allclose(ext.affine, np.diag([2, 2, 2, 1])))
 
 def test_dcmmeta_slice_dim():
     ext = dcmmeta.DcmMetaExtension.make_empty((64, 64, 2), np.eye(4))
@@ -903,6 +1007,23 @@ def test_from_sequence_no_slc():
     ext2 = dcmmeta.DcmMetaExtension.make_empty((2, 2, 2), np.eye(4))
     merged = dcmmeta.DcmMetaExtension.from_sequence([ext1, ext2], 4)
 
+def test_patch_dcm_ds_is():
+    dcm = pydicom.dataset.Dataset()
+    dcm.SliceThickness = '1.5'
+    dcm.ImagePositionPatient = ['1', '2.5', '3']
+    dcm.InstanceNumber = '4'
+    dcm.EchoNumbers = ''
+    dcm.PatientID = 'Test'
+    dcmmeta.patch_dcm_ds_is(dcm)
+    eq_(dcm.data_element('SliceThickness').VR, 'FD')
+    eq_(dcm.SliceThickness, 1.5)
+    eq_(dcm.data_element('ImagePositionPatient').VR, 'FD')
+    eq_(list(dcm.ImagePositionPatient), [1.0, 2.5, 3.0])
+    eq_(dcm.data_element('InstanceNumber').VR, 'SL')
+    eq_(dcm.InstanceNumber, 4)
+    eq_(dcm.data_element('EchoNumbers').VR, 'IS')
+    eq_(dcm.data_element('PatientID').VR, 'LO')
+
 def test_nifti_wrapper_init():
     nii = nb.Nifti1Image(np.zeros((5, 5, 5)), np.eye(4))
     assert_raises(dcmmeta.MissingExtensionError,
@@ -919,6 +1040,15 @@ def test_nifti_wrapper_init():
     ext2 = nw2.meta_ext
     eq_(ext, ext2)
 
+    #An extension with an unparsable affine is skipped rather than raising
+    nii3 = nb.Nifti1Image(np.zeros((5, 5, 5)), np.eye(4))
+    ext3 = dcmmeta.DcmMetaExtension.make_empty((5, 5, 5), np.eye(4))
+    ext3._content['dcmmeta_affine'] = 'bad'
+    nii3.header.extensions.append(ext3)
+    assert_raises(dcmmeta.MissingExtensionError,
+                  dcmmeta.NiftiWrapper,
+                  nii3)
+
 class TestMetaValid(object):
     def setUp(self):
         nii = nb.Nifti1Image(np.zeros((5, 5, 5, 7, 9)), np.eye(4))
@@ -1071,6 +1201,34 @@ class TestGetMeta(object):
                         time_idx + (vector_idx * 7)
                        )
 
+    def test_get_meta_array(self):
+        eq_(self.nw.get_meta_array('missing'), None)
+        eq_(self.nw.get_meta_array('missing', 0), 0)
+        expected = {'global_const_test' : lambda s, t, v: 0,
+                    'global_slices_test' : lambda s, t, v: s + t*5 + v*7*5,
+                    'vector_slices_test' : lambda s, t, v: s + t*5,
+                    'time_slices_test' : lambda s, t, v: s,
+                    'vector_samples_test' : lambda s, t, v: v,
+                    'time_samples_test' : lambda s, t, v: t + v*7,
+                   }
+        for key, exp_func in expected.items():
+            arr = self.nw.get_meta_array(key)
+            eq_(arr.shape, (5, 5, 5, 7, 9))
+            for vector_idx in range(9):
+                for time_idx in range(7):
+                    for slice_idx in range(5):
+                        eq_(arr[3, 1, slice_idx, time_idx, vector_idx],
+                            exp_func(slice_idx, time_idx, vector_idx))
+
+        self.nw.meta_ext.get_class_dict(('global', 'const'))['str_test'] = \
+            'test'
+        arr = self.nw.get_meta_array('str_test')
+        eq_(arr.dtype, object)
+        eq_(arr[0, 0, 0, 0, 0], 'test')
+
+        self.nw.meta_ext.shape = (5, 5, 5, 3, 9)
+        eq_(self.nw.get_meta_array('time_samples_test'), None)
+
 class TestSplit(object):
     def setUp(self):
         self.arr = np.arange(3 * 3 * 3 * 5 * 7).reshape(3, 3, 3, 5, 7)
@@ -1089,6 +1247,19 @@ class TestSplit(object):
                 vals = list(range(mult))
             self.nw.meta_ext.get_class_dict(classes)[key] = vals
 
+    def test_split_extensions(self):
+        for split_nw in self.nw.split():
+            split_exts = split_nw.nii_img.header.extensions
+            eq_(len(split_exts), 1)
+            ok_(split_exts[0] is split_nw.meta_ext)
+            eq_(split_nw.meta_ext.shape, (3, 3, 3, 5))
+        ok_(self.nw.nii_img.header.extensions[0] is self.nw.meta_ext)
+
+    def test_split_missing_extension(self):
+        self.nw.remove_extension()
+        assert_raises(IndexError, self.nw.remove_extension)
+        assert_raises(IndexError, next, self.nw.split())
+
     def test_split_slice(self):
         for split_idx, nw_split in enumerate(self.nw.split(2)):
             eq_(nw_split.nii_img.shape, (3, 3, 1, 5, 7))
@@ -1303,6 +1474,51 @@ def test_merge_inconsistent_hdr():
     eq_(merged_hdr.get_dim_info(), (None, None, 2))
     eq_(merged_hdr.get_xyzt_units(), ('mm', 'unknown'))
 
+def test_merge_mixed_dtypes():
+    input_nws = []
+    for dtype in (np.int16, np.uint16):
+        arr = np.arange(4 * 4 * 4, dtype=dtype).reshape(4, 4, 4)
+        nii = nb.Nifti1Image(arr, np.eye(4))
+        input_nws.append(dcmmeta.NiftiWrapper(nii, True))
+    input_nws[1].nii_img.get_data()[0, 0, 0] = 40000
+
+    merged = dcmmeta.NiftiWrapper.from_sequence(input_nws)
+    merged_data = merged.nii_img.get_data()
+    eq_(merged_data.dtype, np.int32)
+    eq_(merged_data[0, 0, 0, 1], 40000)
+
+def test_merge_threaded():
+    input_nws = []
+    for idx in range(3):
+        arr = np.arange(idx * (4 * 4 * 4),
+                        (idx + 1) * (4 * 4 * 4)
+                       ).reshape(4, 4, 4)
+        nii = nb.Nifti1Image(arr, np.diag((1.1, 1.1, 1.1, 1.0)))
+        input_nws.append(dcmmeta.NiftiWrapper(nii, True))
+    merged = dcmmeta.NiftiWrapper.from_sequence(input_nws)
+
+    #Force the threaded path, even for small inputs on a single CPU, and
+    #record the size of any thread pools that get created
+    pool_sizes = []
+    orig_pool = dcmmeta.ThreadPool
+    def counting_pool(n_threads):
+        pool_sizes.append(n_threads)
+        return orig_pool(n_threads)
+    orig_min_bytes = dcmmeta._thread_min_bytes
+    orig_cpu_count = dcmmeta.cpu_count
+    dcmmeta._thread_min_bytes = 0
+    dcmmeta.cpu_count = lambda: 4
+    dcmmeta.ThreadPool = counting_pool
+    try:
+        threaded = dcmmeta.NiftiWrapper.from_sequence(input_nws)
+    finally:
+        dcmmeta._thread_min_bytes = orig_min_bytes
+        dcmmeta.cpu_count = orig_cpu_count
+        dcmmeta.ThreadPool = orig_pool
+    eq_(pool_sizes, [3, 3])
+    ok_(np.all(threaded.nii_img.get_data() == merged.nii_img.get_data()))
+    eq_(threaded.meta_ext, merged.meta_ext)
+
 def test_merge_with_slc_and_without():
     #Test merging two data sets where one has per slice meta and other does not
     input_nws = []